@@ -65,7 +65,9 @@ class nwFiles():
     PROJ_LOCK   = "nwProject.lock"
     TOC_TXT     = "ToC.txt"
     SESS_STATS  = "sessionStats.log"
-    INDEX_FILE  = "tagsIndex.json"
+    INDEX_FILE  = "tagsIndex.json" # Legacy single file index
+    INDEX_DIR   = "index"
+    INDEX_MAIN  = "manifest.json"
     OPTS_FILE   = "guiOptions.json"
     RECENT_FILE = "recentProjects.json"
     BUILD_CACHE = "prevBuild.json"
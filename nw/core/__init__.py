@@ -2,6 +2,7 @@
 
 from nw.core.document import NWDoc
 from nw.core.index import NWIndex
+from nw.core.indexer import NWIndexer
 from nw.core.project import NWProject
 from nw.core.spellcheck import NWSpellCheck, NWSpellEnchant, NWSpellSimple
 from nw.core.tohtml import ToHtml
@@ -13,6 +14,7 @@ __all__ = [
     "numberToWord",
     "NWDoc",
     "NWIndex",
+    "NWIndexer",
     "NWProject",
     "NWSpellCheck",
     "NWSpellEnchant",
@@ -35,6 +35,7 @@ from time import time
 from nw.constants import (
     nwFiles, nwKeyWords, nwItemType, nwItemClass, nwItemLayout, nwAlert
 )
+from nw.common import isHandle
 from nw.core.document import NWDoc
 from nw.core.tools import countWords
 
@@ -56,12 +57,19 @@ class NWIndex():
         self.novelIndex = None
         self.noteIndex  = None
         self.textCounts = None
+        self.handleTags = None
+        self.tagRefs    = None
+        self.fileStamps = None
 
         # TimeStamps
         self.timeNovel = 0
         self.timeNote  = 0
         self.timeIndex = 0
 
+        # Persistence
+        self._dirtyHandles = set()  # Handles changed since last save
+        self._rewriteAll   = True   # Whether all shards must be written
+
         self.clearIndex()
 
         return
@@ -78,9 +86,16 @@ class NWIndex():
         self.novelIndex = {}
         self.noteIndex  = {}
         self.textCounts = {}
+        self.handleTags = {}
+        self.tagRefs    = {}
+        self.fileStamps = {}
         self.timeNovel  = 0
         self.timeNote   = 0
         self.timeIndex  = 0
+
+        self._dirtyHandles = set()
+        self._rewriteAll   = True
+
         return
 
     def deleteHandle(self, tHandle):
@@ -88,18 +103,14 @@ class NWIndex():
         """
         logger.debug("Removing item %s from the index" % tHandle)
 
-        delTags = []
-        for tTag in self.tagIndex:
-            if self.tagIndex[tTag][1] == tHandle:
-                delTags.append(tTag)
-
-        for tTag in delTags:
-            self.tagIndex.pop(tTag, None)
-
+        self._clearHandleTags(tHandle)
+        self._clearTagRefs(tHandle)
         self.refIndex.pop(tHandle, None)
         self.novelIndex.pop(tHandle, None)
         self.noteIndex.pop(tHandle, None)
         self.textCounts.pop(tHandle, None)
+        self.fileStamps.pop(tHandle, None)
+        self._dirtyHandles.add(tHandle)
 
         return
 
@@ -129,14 +140,39 @@ class NWIndex():
 
     def loadIndex(self):
         """Load index from last session from the project meta folder.
+        The index is stored as one shard file per document handle in the
+        index folder, and the manifest file lists the handles that were
+        saved. If no manifest exists, the legacy single file index is
+        loaded instead, and converted on the next save.
         """
-        theData   = {}
-        indexFile = os.path.join(self.theProject.projMeta, nwFiles.INDEX_FILE)
+        indexDir   = os.path.join(self.theProject.projMeta, nwFiles.INDEX_DIR)
+        mainFile   = os.path.join(indexDir, nwFiles.INDEX_MAIN)
+        legacyFile = os.path.join(self.theProject.projMeta, nwFiles.INDEX_FILE)
+
+        if os.path.isfile(mainFile):
+            logger.debug("Loading index files")
+            try:
+                with open(mainFile, mode="r", encoding="utf8") as inFile:
+                    theMain = json.load(inFile)
+                for tHandle in theMain.get("handles", []):
+                    shardFile = os.path.join(indexDir, tHandle+".json")
+                    with open(shardFile, mode="r", encoding="utf8") as inFile:
+                        self._unpackShard(tHandle, json.load(inFile))
+            except Exception as e:
+                logger.error("Failed to load index file")
+                logger.error(str(e))
+                self.clearIndex()
+                self.indexBroken = True
+                return False
+
+            self._dirtyHandles = set()
+            self._rewriteAll = False
 
-        if os.path.isfile(indexFile):
-            logger.debug("Loading index file")
+        elif os.path.isfile(legacyFile):
+            logger.debug("Loading legacy index file")
+            theData = {}
             try:
-                with open(indexFile, mode="r", encoding="utf8") as inFile:
+                with open(legacyFile, mode="r", encoding="utf8") as inFile:
                     theData = json.load(inFile)
             except Exception as e:
                 logger.error("Failed to load index file")
@@ -154,36 +190,77 @@ class NWIndex():
             if "textCounts" in theData.keys():
                 self.textCounts = theData["textCounts"]
 
-            nowTime = round(time())
-            self.timeNovel = nowTime
-            self.timeNote  = nowTime
-            self.timeIndex = nowTime
+            self._rewriteAll = True
+
+        else:
+            self.checkIndex()
+            return True
+
+        nowTime = round(time())
+        self.timeNovel = nowTime
+        self.timeNote  = nowTime
+        self.timeIndex = nowTime
 
         self.checkIndex()
+        self._buildHandleTags()
+        self._buildTagRefs()
 
         return True
 
     def saveIndex(self):
-        """Save the current index as a json file in the project meta
-        data folder.
+        """Save the index shards of all handles that have changed since
+        the last save to the index folder in the project meta data
+        folder, followed by the manifest. The manifest is written last
+        so that a failed save never points to a missing shard.
         """
-        logger.debug("Saving index file")
-        indexFile = os.path.join(self.theProject.projMeta, nwFiles.INDEX_FILE)
+        logger.debug("Saving index files")
+        indexDir   = os.path.join(self.theProject.projMeta, nwFiles.INDEX_DIR)
+        mainFile   = os.path.join(indexDir, nwFiles.INDEX_MAIN)
+        legacyFile = os.path.join(self.theProject.projMeta, nwFiles.INDEX_FILE)
+
+        allHandles = self._indexedHandles()
+        if self._rewriteAll:
+            saveHandles = allHandles
+        else:
+            saveHandles = self._dirtyHandles
 
         try:
-            with open(indexFile, mode="w+", encoding="utf8") as outFile:
-                json.dump({
-                    "tagIndex"   : self.tagIndex,
-                    "refIndex"   : self.refIndex,
-                    "novelIndex" : self.novelIndex,
-                    "noteIndex"  : self.noteIndex,
-                    "textCounts" : self.textCounts,
-                }, outFile, indent=2)
+            if not os.path.isdir(indexDir):
+                os.mkdir(indexDir)
+
+            for tHandle in saveHandles:
+                shardFile = os.path.join(indexDir, tHandle+".json")
+                if tHandle in allHandles:
+                    theShard = self._packShard(tHandle)
+                    self._writeJson(shardFile, theShard)
+                elif os.path.isfile(shardFile):
+                    os.unlink(shardFile)
+
+            if self._rewriteAll:
+                for fileName in os.listdir(indexDir):
+                    fHandle, fExt = os.path.splitext(fileName)
+                    if fExt == ".json" and isHandle(fHandle) and fHandle not in allHandles:
+                        os.unlink(os.path.join(indexDir, fileName))
+
+            self._writeJson(mainFile, {
+                "handles": sorted(allHandles),
+            })
+
         except Exception as e:
             logger.error("Failed to save index file")
             logger.error(str(e))
             return False
 
+        self._dirtyHandles = set()
+        self._rewriteAll = False
+
+        if os.path.isfile(legacyFile):
+            try:
+                os.unlink(legacyFile)
+                logger.info("Deleted legacy index file")
+            except Exception as e:
+                logger.error(str(e))
+
         return True
 
     def checkIndex(self):
@@ -218,6 +295,10 @@ class NWIndex():
                 if len(self.textCounts[tHandle]) != 3:
                     self.indexBroken = True
 
+            for tHandle in self.fileStamps:
+                if len(self.fileStamps[tHandle]) != 2:
+                    self.indexBroken = True
+
         except Exception:
             self.indexBroken = True
 
@@ -230,231 +311,277 @@ class NWIndex():
 
         return
 
+    ##
+    #  File Stamps
+    ##
+
+    def fileStamp(self, tHandle):
+        """Return the file stamp of a handle's document file.
+        """
+        return getFileStamp(os.path.join(self.theProject.projContent, tHandle+".nwd"))
+
+    def checkFileStamps(self):
+        """Compare the file stamps in the index with the document files
+        in the project content folder, and return a list of handles of
+        documents that have changed since they were indexed. Entries for
+        handles that are no longer in the project are removed.
+        """
+        diskStamps = {}
+        try:
+            with os.scandir(self.theProject.projContent) as theDir:
+                for theEntry in theDir:
+                    if theEntry.name.endswith(".nwd") and theEntry.is_file():
+                        theStat = theEntry.stat()
+                        diskStamps[theEntry.name[:-4]] = [theStat.st_mtime_ns, theStat.st_size]
+        except Exception as e:
+            logger.error("Failed to scan project content folder")
+            logger.error(str(e))
+            return []
+
+        for tHandle in self._indexedHandles():
+            if tHandle not in self.theProject.projTree:
+                self.deleteHandle(tHandle)
+
+        staleHandles = []
+        for tItem in self.theProject.projTree:
+            if tItem is None or tItem.itemType != nwItemType.FILE:
+                continue
+            tHandle = tItem.itemHandle
+            if diskStamps.get(tHandle, None) == self.fileStamps.get(tHandle, None):
+                continue
+            canCount, _ = self.checkItem(tHandle)
+            if canCount:
+                staleHandles.append(tHandle)
+
+        logger.debug("Found %d changed documents" % len(staleHandles))
+
+        return staleHandles
+
     ##
     #  Index Building
     ##
 
-    def scanText(self, tHandle, theText):
-        """Scan a piece of text associated with a handle. This will
-        update the indices accordingly. This function takes the handle
-        and text as separate inputs as we want to primarily scan the
-        files before we save them, unless we're rebuilding the index.
+    def checkItem(self, tHandle):
+        """Check whether an item can be word counted and indexed. Files
+        in the trash or archive folders are counted, but not indexed.
+        Returns two booleans.
         """
         theItem = self.theProject.projTree[tHandle]
         theRoot = self.theProject.projTree.getRootItem(tHandle)
 
         if theItem is None:
             logger.info("Not indexing unknown item %s" % tHandle)
-            return False
+            return False, False
         if theItem.itemType != nwItemType.FILE:
             logger.info("Not indexing non-file item %s" % tHandle)
-            return False
+            return False, False
         if theItem.itemLayout == nwItemLayout.NO_LAYOUT:
             logger.info("Not indexing no-layout item %s" % tHandle)
-            return False
+            return False, False
         if theItem.itemParent is None:
             logger.info("Not indexing orphaned item %s" % tHandle)
-            return False
+            return False, False
 
-        # Run word counter for the whole text
-        cC, wC, pC = countWords(theText)
-        self.textCounts[tHandle] = [cC, wC, pC]
-
-        # If the file is archived or trashed, we don't index the file itself
         if self.theProject.projTree.isTrashRoot(theItem.itemParent):
             logger.info("Not indexing trash item %s" % tHandle)
-            return False
+            return True, False
         if theRoot.itemClass == nwItemClass.ARCHIVE:
             logger.info("Not indexing archived item %s" % tHandle)
-            return False
+            return True, False
+
+        return True, True
 
-        itemClass  = theItem.itemClass
-        itemLayout = theItem.itemLayout
+    def scanText(self, tHandle, theText):
+        """Scan a piece of text associated with a handle. This will
+        update the indices accordingly. This function takes the handle
+        and text as separate inputs as we want to primarily scan the
+        files before we save them, unless we're rebuilding the index.
+        """
+        canCount, canIndex = self.checkItem(tHandle)
+        if not canCount:
+            return False
 
+        theItem = self.theProject.projTree[tHandle]
         logger.debug("Indexing item with handle %s" % tHandle)
 
-        # Check file type, and reset its old index
-        # Also add a dummy entry T000000 in case the file has no title
-        self.refIndex[tHandle] = {}
-        self.refIndex[tHandle]["T000000"] = {
-            "tags"    : [],
-            "updated" : round(time()),
-        }
-        if itemLayout == nwItemLayout.NOTE:
-            self.noteIndex[tHandle] = {}
-            isNovel = False
+        theScan = scanDocument(
+            tHandle, theText, theItem.itemClass, theItem.itemLayout, canIndex
+        )
+        self.applyScan(tHandle, theScan)
+
+        return canIndex
+
+    def applyScan(self, tHandle, theScan):
+        """Replace the index entries of a handle with the result of a
+        call to scanDocument.
+        """
+        self.textCounts[tHandle] = theScan["counts"]
+        self._dirtyHandles.add(tHandle)
+
+        theStamp = theScan["stamp"]
+        if theStamp is None:
+            theStamp = self.fileStamp(tHandle)
+        if theStamp is None:
+            self.fileStamps.pop(tHandle, None)
         else:
-            self.novelIndex[tHandle] = {}
-            isNovel = True
-
-        # Also clear references to file in tag index
-        clearTags = []
-        for aTag in self.tagIndex:
-            if self.tagIndex[aTag][1] == tHandle:
-                clearTags.append(aTag)
-        for aTag in clearTags:
-            self.tagIndex.pop(aTag)
-
-        nLine  = 0
-        nTitle = 0
-        theLines = theText.splitlines()
-        for aLine in theLines:
-            aLine  = aLine
-            nLine += 1
-            nChar  = len(aLine.strip())
-            if nChar == 0:
-                continue
+            self.fileStamps[tHandle] = theStamp
 
-            if aLine.startswith(r"#"):
-                isTitle = self._indexTitle(tHandle, isNovel, aLine, nLine, itemLayout)
-                if isTitle and nLine > 0:
-                    if nTitle > 0:
-                        lastText = "\n".join(theLines[nTitle-1:nLine-1])
-                        self._indexWordCounts(tHandle, isNovel, lastText, nTitle)
-                    nTitle = nLine
+        theRefs = theScan["refs"]
+        if theRefs is None:
+            return
 
-            elif aLine.startswith(r"@"):
-                self._indexNoteRef(tHandle, aLine, nLine, nTitle)
-                self._indexTag(tHandle, aLine, nLine, nTitle, itemClass)
+        self._clearTagRefs(tHandle)
+        self._clearHandleTags(tHandle)
 
-            elif aLine.startswith(r"%"):
-                if nTitle > 0:
-                    toCheck = aLine[1:].lstrip()
-                    synTag = toCheck[:9].lower()
-                    tLen = len(aLine)
-                    cLen = len(toCheck)
-                    cOff = tLen - cLen
-                    if synTag == "synopsis:":
-                        self._indexSynopsis(tHandle, isNovel, aLine[cOff+9:].strip(), nTitle)
-
-        # Count words for remaining text after last heading
-        if nTitle > 0:
-            lastText = "\n".join(theLines[nTitle-1:])
-            self._indexWordCounts(tHandle, isNovel, lastText, nTitle)
+        self.refIndex[tHandle] = theRefs
+        if theScan["isNovel"]:
+            self.novelIndex[tHandle] = theScan["headings"]
+        else:
+            self.noteIndex[tHandle] = theScan["headings"]
+
+        for theTag, theEntry in theScan["tags"]:
+            self._setTag(theTag, theEntry)
+
+        for sTitle, refTitle in theRefs.items():
+            for _, theKey, theTag in refTitle["tags"]:
+                self._addTagRef(theTag, tHandle, sTitle, theKey)
 
         # Update timestamps for index changes
         nowTime = round(time())
         self.timeIndex = nowTime
-        if isNovel:
+        if theScan["isNovel"]:
             self.timeNovel = nowTime
         else:
             self.timeNote = nowTime
 
-        return True
+        return
 
     ##
-    #  Internal Indexers
+    #  Handle to Tags Map
     ##
 
-    def _indexTitle(self, tHandle, isNovel, aLine, nLine, itemLayout):
-        """Save information about the title and its location in the
-        file to the index.
+    def _setTag(self, theTag, theEntry):
+        """Add a tag to the tag index, and move it to the tag set of the
+        handle that now defines it.
         """
-        if aLine.startswith("# "):
-            hDepth = "H1"
-            hText  = aLine[2:].strip()
-        elif aLine.startswith("## "):
-            hDepth = "H2"
-            hText  = aLine[3:].strip()
-        elif aLine.startswith("### "):
-            hDepth = "H3"
-            hText  = aLine[4:].strip()
-        elif aLine.startswith("#### "):
-            hDepth = "H4"
-            hText  = aLine[5:].strip()
-        else:
-            return False
+        oldEntry = self.tagIndex.get(theTag, None)
+        if oldEntry is not None and oldEntry[1] != theEntry[1]:
+            self.handleTags.get(oldEntry[1], set()).discard(theTag)
+            self._dirtyHandles.add(oldEntry[1])
+        self.tagIndex[theTag] = theEntry
+        self.handleTags.setdefault(theEntry[1], set()).add(theTag)
+        return
 
-        sTitle = "T%06d" % nLine
-        self.refIndex[tHandle][sTitle] = {
-            "tags"    : [],
-            "updated" : round(time()),
-        }
-        theData = {
-            "level"    : hDepth,
-            "title"    : hText,
-            "layout"   : itemLayout.name,
-            "synopsis" : "",
-            "cCount"   : 0,
-            "wCount"   : 0,
-            "pCount"   : 0,
-            "updated"  : round(time()),
-        }
+    def _clearHandleTags(self, tHandle):
+        """Remove all tags defined by a handle from the tag index.
+        """
+        for theTag in self.handleTags.pop(tHandle, set()):
+            self.tagIndex.pop(theTag, None)
+        return
 
-        if hText != "":
-            if isNovel:
-                if tHandle in self.novelIndex:
-                    self.novelIndex[tHandle][sTitle] = theData
-            else:
-                if tHandle in self.noteIndex:
-                    self.noteIndex[tHandle][sTitle] = theData
+    def _buildHandleTags(self):
+        """Rebuild the handle to tags map from the tag index.
+        """
+        self.handleTags = {}
+        for theTag, theEntry in self.tagIndex.items():
+            self.handleTags.setdefault(theEntry[1], set()).add(theTag)
+        return
 
-        return True
+    ##
+    #  Tag to References Map
+    ##
 
-    def _indexWordCounts(self, tHandle, isNovel, theText, nTitle):
-        """Count text stats and save the counts to the index.
+    def _addTagRef(self, theTag, tHandle, sTitle, theKey):
+        """Record that a section of a handle references a tag.
         """
-        cC, wC, pC = countWords(theText)
-        sTitle = "T%06d" % nTitle
-        if isNovel:
-            if tHandle in self.novelIndex:
-                if sTitle in self.novelIndex[tHandle]:
-                    self.novelIndex[tHandle][sTitle]["cCount"] = cC
-                    self.novelIndex[tHandle][sTitle]["wCount"] = wC
-                    self.novelIndex[tHandle][sTitle]["pCount"] = pC
-                    self.novelIndex[tHandle][sTitle]["updated"] = round(time())
-        else:
-            if tHandle in self.noteIndex:
-                if sTitle in self.noteIndex[tHandle]:
-                    self.noteIndex[tHandle][sTitle]["cCount"] = cC
-                    self.noteIndex[tHandle][sTitle]["wCount"] = wC
-                    self.noteIndex[tHandle][sTitle]["pCount"] = pC
-                    self.noteIndex[tHandle][sTitle]["updated"] = round(time())
+        self.tagRefs.setdefault(theTag, {}).setdefault(tHandle, []).append((sTitle, theKey))
         return
 
-    def _indexSynopsis(self, tHandle, isNovel, theText, nTitle):
-        """Save the synopsis to the index.
+    def _clearTagRefs(self, tHandle):
+        """Remove all references made by a handle from the tag to
+        references map, using the handle's current reference index.
         """
-        sTitle = "T%06d" % nTitle
-        if isNovel:
-            if tHandle in self.novelIndex:
-                if sTitle in self.novelIndex[tHandle]:
-                    self.novelIndex[tHandle][sTitle]["synopsis"] = theText
-                    self.novelIndex[tHandle][sTitle]["updated"] = round(time())
-        else:
-            if tHandle in self.noteIndex:
-                if sTitle in self.noteIndex[tHandle]:
-                    self.noteIndex[tHandle][sTitle]["synopsis"] = theText
-                    self.noteIndex[tHandle][sTitle]["updated"] = round(time())
+        for refTitle in self.refIndex.get(tHandle, {}).values():
+            for _, _, theTag in refTitle["tags"]:
+                theRefs = self.tagRefs.get(theTag, None)
+                if theRefs is not None:
+                    theRefs.pop(tHandle, None)
+                    if not theRefs:
+                        self.tagRefs.pop(theTag)
         return
 
-    def _indexNoteRef(self, tHandle, aLine, nLine, nTitle):
-        """Validate and save the information about a reference to a tag
-        in another file.
+    def _buildTagRefs(self):
+        """Rebuild the tag to references map from the reference index.
         """
-        isValid, theBits, _ = self.scanThis(aLine)
-        if not isValid or len(theBits) == 0:
-            return False
-
-        sTitle = "T%06d" % nTitle
-        if sTitle in self.refIndex[tHandle] and theBits[0] != nwKeyWords.TAG_KEY:
-            for aVal in theBits[1:]:
-                self.refIndex[tHandle][sTitle]["tags"].append([nLine, theBits[0], aVal])
+        self.tagRefs = {}
+        for tHandle, theTitles in self.refIndex.items():
+            for sTitle, refTitle in theTitles.items():
+                for _, theKey, theTag in refTitle["tags"]:
+                    self._addTagRef(theTag, tHandle, sTitle, theKey)
+        return
 
-        return True
+    ##
+    #  Index Shards
+    ##
 
-    def _indexTag(self, tHandle, aLine, nLine, nTitle, itemClass):
-        """Validate and save the information from a tag.
+    def _indexedHandles(self):
+        """Return the set of all handles that have entries in the index.
         """
-        isValid, theBits, thePos = self.scanThis(aLine)
-        if not isValid or len(theBits) != 2:
-            return False
-
-        if theBits[0] == nwKeyWords.TAG_KEY:
-            sTitle = "T%06d" % nTitle
-            self.tagIndex[theBits[1]] = [nLine, tHandle, itemClass.name, sTitle]
+        allHandles = set(self.refIndex)
+        allHandles.update(self.novelIndex)
+        allHandles.update(self.noteIndex)
+        allHandles.update(self.textCounts)
+        allHandles.update(self.fileStamps)
+        for tHandle, theTags in self.handleTags.items():
+            if theTags:
+                allHandles.add(tHandle)
+        return allHandles
+
+    def _packShard(self, tHandle):
+        """Collect all index entries of a handle into a dictionary.
+        """
+        theTags = {}
+        for theTag in sorted(self.handleTags.get(tHandle, set())):
+            theTags[theTag] = self.tagIndex[theTag]
+
+        theShard = {"tagIndex": theTags}
+        if tHandle in self.refIndex:
+            theShard["refIndex"] = self.refIndex[tHandle]
+        if tHandle in self.novelIndex:
+            theShard["novelIndex"] = self.novelIndex[tHandle]
+        if tHandle in self.noteIndex:
+            theShard["noteIndex"] = self.noteIndex[tHandle]
+        if tHandle in self.textCounts:
+            theShard["textCounts"] = self.textCounts[tHandle]
+        if tHandle in self.fileStamps:
+            theShard["fileStamp"] = self.fileStamps[tHandle]
+        return theShard
+
+    def _unpackShard(self, tHandle, theShard):
+        """Merge the index entries of a handle into the index.
+        """
+        self.tagIndex.update(theShard.get("tagIndex", {}))
+        if "refIndex" in theShard:
+            self.refIndex[tHandle] = theShard["refIndex"]
+        if "novelIndex" in theShard:
+            self.novelIndex[tHandle] = theShard["novelIndex"]
+        if "noteIndex" in theShard:
+            self.noteIndex[tHandle] = theShard["noteIndex"]
+        if "textCounts" in theShard:
+            self.textCounts[tHandle] = theShard["textCounts"]
+        if "fileStamp" in theShard:
+            self.fileStamps[tHandle] = theShard["fileStamp"]
+        return
 
-        return True
+    def _writeJson(self, theFile, theData):
+        """Write a json file via a temp file so that a failed write does
+        not overwrite the previous version.
+        """
+        tempFile = theFile+"~"
+        with open(tempFile, mode="w", encoding="utf8") as outFile:
+            json.dump(theData, outFile)
+        os.replace(tempFile, theFile)
+        return
 
     ##
     #  Check @ Lines
@@ -464,39 +591,7 @@ class NWIndex():
         """Scan a line starting with @ to check that it's valid. Then
         split it up into its elements and positions as two arrays.
         """
-        theBits = [] # The elements of the string
-        thePos  = [] # The absolute position of each element
-
-        aLine = aLine.rstrip() # Remove all trailing white spaces
-        nChar = len(aLine)
-        if nChar < 2:
-            return False, theBits, thePos
-        if aLine[0] != "@":
-            return False, theBits, thePos
-
-        cKey, _, cVals = aLine.partition(":")
-        sKey = cKey.strip()
-        if sKey == "@":
-            return False, theBits, thePos
-
-        cPos = 0
-        theBits.append(sKey)
-        thePos.append(cPos)
-        cPos += len(cKey) + 1
-
-        if not cVals:
-            # No values, so we're done
-            return True, theBits, thePos
-
-        for cVal in cVals.split(","):
-            sVal = cVal.strip()
-            rLen = len(cVal.lstrip())
-            tLen = len(cVal)
-            theBits.append(sVal)
-            thePos.append(cPos + tLen - rLen)
-            cPos += tLen + 1
-
-        return True, theBits, thePos
+        return _scanThis(aLine)
 
     def checkThese(self, theBits, tItem):
         """Check the tags against the index to see if they are valid
@@ -602,24 +697,34 @@ class NWIndex():
 
     def getBackReferenceList(self, tHandle):
         """Build a list of files referring back to our file, specified
-        by tHandle.
+        by tHandle. Each file points to its first section making the
+        reference.
         """
         theRefs = {}
         if tHandle is None:
             return theRefs
 
-        theTags = set()
-        for tTag in self.tagIndex:
-            if tHandle == self.tagIndex[tTag][1]:
-                theTags.add(tTag)
+        for tTag in self.handleTags.get(tHandle, set()):
+            for rHandle, tagRefs in self.tagRefs.get(tTag, {}).items():
+                sTitle = tagRefs[0][0]
+                if rHandle not in theRefs or sTitle < theRefs[rHandle]:
+                    theRefs[rHandle] = sTitle
 
-        if theTags:
-            for tHandle in self.refIndex:
-                for sTitle in self.refIndex[tHandle]:
-                    for _, _, tTag in self.refIndex[tHandle][sTitle]["tags"]:
-                        if tTag in theTags and tHandle not in theRefs:
-                            theRefs[tHandle] = sTitle
+        return theRefs
 
+    def getTagReferences(self, theTag, theKey=None):
+        """Return a list of (handle, title) pairs for all sections that
+        reference a given tag, optionally only with a given keyword.
+        """
+        theRefs = []
+        for tHandle, tagRefs in self.tagRefs.get(theTag, {}).items():
+            theTitles = set()
+            for sTitle, refKey in tagRefs:
+                if theKey is not None and refKey != theKey:
+                    continue
+                if sTitle not in theTitles:
+                    theTitles.add(sTitle)
+                    theRefs.append((tHandle, sTitle))
         return theRefs
 
     def getTagSource(self, theTag):
@@ -632,3 +737,207 @@ class NWIndex():
         return None, 0, "T000000"
 
 # END Class NWIndex
+
+# =============================================================================================== #
+#  Document Scanner
+#  These functions do not depend on the project, so they can be used
+#  by worker processes.
+# =============================================================================================== #
+
+def scanDocument(tHandle, theText, itemClass, itemLayout, fullScan=True):
+    """Scan the text of a document and return its index entries. If
+    fullScan is False, only the word counts are computed. The result
+    is applied to the index with NWIndex.applyScan.
+    """
+    theScan = {
+        "stamp"    : None,
+        "counts"   : list(countWords(theText)),
+        "isNovel"  : itemLayout != nwItemLayout.NOTE,
+        "refs"     : None,
+        "headings" : {},
+        "tags"     : [],
+    }
+    if not fullScan:
+        return theScan
+
+    # Add a dummy entry T000000 in case the file has no title
+    theScan["refs"] = {
+        "T000000": {
+            "tags"    : [],
+            "updated" : round(time()),
+        }
+    }
+
+    nLine  = 0
+    nTitle = 0
+    theLines = theText.splitlines()
+    for aLine in theLines:
+        nLine += 1
+        nChar  = len(aLine.strip())
+        if nChar == 0:
+            continue
+
+        if aLine.startswith(r"#"):
+            isTitle = _indexTitle(theScan, aLine, nLine, itemLayout)
+            if isTitle and nLine > 0:
+                if nTitle > 0:
+                    lastText = "\n".join(theLines[nTitle-1:nLine-1])
+                    _indexWordCounts(theScan, lastText, nTitle)
+                nTitle = nLine
+
+        elif aLine.startswith(r"@"):
+            _indexNoteRef(theScan, aLine, nLine, nTitle)
+            _indexTag(theScan, tHandle, aLine, nLine, nTitle, itemClass)
+
+        elif aLine.startswith(r"%"):
+            if nTitle > 0:
+                toCheck = aLine[1:].lstrip()
+                synTag = toCheck[:9].lower()
+                tLen = len(aLine)
+                cLen = len(toCheck)
+                cOff = tLen - cLen
+                if synTag == "synopsis:":
+                    _indexSynopsis(theScan, aLine[cOff+9:].strip(), nTitle)
+
+    # Count words for remaining text after last heading
+    if nTitle > 0:
+        lastText = "\n".join(theLines[nTitle-1:])
+        _indexWordCounts(theScan, lastText, nTitle)
+
+    return theScan
+
+def getFileStamp(docPath):
+    """Return the modification time and size of a file, which is used
+    to detect documents that changed since they were indexed. Returns
+    None if the file does not exist.
+    """
+    try:
+        theStat = os.stat(docPath)
+    except OSError:
+        return None
+    return [theStat.st_mtime_ns, theStat.st_size]
+
+def _indexTitle(theScan, aLine, nLine, itemLayout):
+    """Save information about the title and its location in the
+    file to the index.
+    """
+    if aLine.startswith("# "):
+        hDepth = "H1"
+        hText  = aLine[2:].strip()
+    elif aLine.startswith("## "):
+        hDepth = "H2"
+        hText  = aLine[3:].strip()
+    elif aLine.startswith("### "):
+        hDepth = "H3"
+        hText  = aLine[4:].strip()
+    elif aLine.startswith("#### "):
+        hDepth = "H4"
+        hText  = aLine[5:].strip()
+    else:
+        return False
+
+    sTitle = "T%06d" % nLine
+    theScan["refs"][sTitle] = {
+        "tags"    : [],
+        "updated" : round(time()),
+    }
+    if hText != "":
+        theScan["headings"][sTitle] = {
+            "level"    : hDepth,
+            "title"    : hText,
+            "layout"   : itemLayout.name,
+            "synopsis" : "",
+            "cCount"   : 0,
+            "wCount"   : 0,
+            "pCount"   : 0,
+            "updated"  : round(time()),
+        }
+
+    return True
+
+def _indexWordCounts(theScan, theText, nTitle):
+    """Count text stats and save the counts to the index.
+    """
+    cC, wC, pC = countWords(theText)
+    sTitle = "T%06d" % nTitle
+    if sTitle in theScan["headings"]:
+        theScan["headings"][sTitle]["cCount"] = cC
+        theScan["headings"][sTitle]["wCount"] = wC
+        theScan["headings"][sTitle]["pCount"] = pC
+        theScan["headings"][sTitle]["updated"] = round(time())
+    return
+
+def _indexSynopsis(theScan, theText, nTitle):
+    """Save the synopsis to the index.
+    """
+    sTitle = "T%06d" % nTitle
+    if sTitle in theScan["headings"]:
+        theScan["headings"][sTitle]["synopsis"] = theText
+        theScan["headings"][sTitle]["updated"] = round(time())
+    return
+
+def _indexNoteRef(theScan, aLine, nLine, nTitle):
+    """Validate and save the information about a reference to a tag
+    in another file.
+    """
+    isValid, theBits, _ = _scanThis(aLine)
+    if not isValid or len(theBits) == 0:
+        return False
+
+    sTitle = "T%06d" % nTitle
+    if sTitle in theScan["refs"] and theBits[0] != nwKeyWords.TAG_KEY:
+        for aVal in theBits[1:]:
+            theScan["refs"][sTitle]["tags"].append([nLine, theBits[0], aVal])
+
+    return True
+
+def _indexTag(theScan, tHandle, aLine, nLine, nTitle, itemClass):
+    """Validate and save the information from a tag.
+    """
+    isValid, theBits, thePos = _scanThis(aLine)
+    if not isValid or len(theBits) != 2:
+        return False
+
+    if theBits[0] == nwKeyWords.TAG_KEY:
+        sTitle = "T%06d" % nTitle
+        theScan["tags"].append((theBits[1], [nLine, tHandle, itemClass.name, sTitle]))
+
+    return True
+
+def _scanThis(aLine):
+    """Scan a line starting with @ to check that it's valid. Then
+    split it up into its elements and positions as two arrays.
+    """
+    theBits = [] # The elements of the string
+    thePos  = [] # The absolute position of each element
+
+    aLine = aLine.rstrip() # Remove all trailing white spaces
+    nChar = len(aLine)
+    if nChar < 2:
+        return False, theBits, thePos
+    if aLine[0] != "@":
+        return False, theBits, thePos
+
+    cKey, _, cVals = aLine.partition(":")
+    sKey = cKey.strip()
+    if sKey == "@":
+        return False, theBits, thePos
+
+    cPos = 0
+    theBits.append(sKey)
+    thePos.append(cPos)
+    cPos += len(cKey) + 1
+
+    if not cVals:
+        # No values, so we're done
+        return True, theBits, thePos
+
+    for cVal in cVals.split(","):
+        sVal = cVal.strip()
+        rLen = len(cVal.lstrip())
+        tLen = len(cVal)
+        theBits.append(sVal)
+        thePos.append(cPos + tLen - rLen)
+        cPos += tLen + 1
+
+    return True, theBits, thePos
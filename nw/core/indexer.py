@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""novelWriter Project Indexer
+
+ novelWriter – Project Indexer
+===============================
+ Class for rebuilding the project index using multiple processes
+
+ File History:
+ Created: 2026-10-18 [1.0rc2]
+
+ This file is a part of novelWriter
+ Copyright 2018–2020, Veronica Berglyd Olsen
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful, but
+ WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+ General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from nw.constants import nwItemType
+from nw.core.index import scanDocument, getFileStamp
+
+logger = logging.getLogger(__name__)
+
+class NWIndexer():
+
+    # Below this number of documents, the process pool start-up time is
+    # larger than the time saved, so the documents are scanned in-process
+    MIN_PARALLEL = 100
+
+    # Number of chunks per worker, which also sets how often progress is
+    # reported back
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, theProject, theIndex):
+
+        self.theProject = theProject
+        self.theIndex   = theIndex
+
+        return
+
+    ##
+    #  Methods
+    ##
+
+    def rebuildIndex(self, progressFunc=None, numWorkers=None):
+        """Clear the index, and rebuild it from all files in the project.
+        The documents are read and scanned by worker processes, and the
+        results merged into the index in project tree order when all
+        workers are done. The optional progressFunc is called with the
+        number of scanned and total documents each time a chunk of
+        documents is completed. Returns the number of documents scanned.
+        """
+        self.theIndex.clearIndex()
+
+        theJobs = self.makeJobs([
+            tItem.itemHandle for tItem in self.theProject.projTree
+            if tItem is not None and tItem.itemType == nwItemType.FILE
+        ])
+
+        nJobs = len(theJobs)
+        if numWorkers is None:
+            numWorkers = os.cpu_count() or 1
+
+        theScans = {}
+        if numWorkers < 2 or nJobs < self.MIN_PARALLEL:
+            logger.debug("Scanning %d documents in-process" % nJobs)
+            for tHandle, theScan in scanJobs(theJobs):
+                theScans[tHandle] = theScan
+            if progressFunc is not None:
+                progressFunc(nJobs, nJobs)
+
+        else:
+            logger.debug("Scanning %d documents with %d workers" % (nJobs, numWorkers))
+            nChunks = numWorkers*self.CHUNKS_PER_WORKER
+            theChunks = [theJobs[i::nChunks] for i in range(nChunks)]
+            mpContext = get_context("spawn")
+            with ProcessPoolExecutor(numWorkers, mp_context=mpContext) as theExec:
+                theFutures = [
+                    theExec.submit(scanJobs, theChunk) for theChunk in theChunks if theChunk
+                ]
+                for theFuture in as_completed(theFutures):
+                    for tHandle, theScan in theFuture.result():
+                        theScans[tHandle] = theScan
+                    if progressFunc is not None:
+                        progressFunc(len(theScans), nJobs)
+
+        # Merge in tree order, so that tags defined in more than one
+        # document resolve the same way as a serial scan
+        for tHandle, _, _, _, _ in theJobs:
+            if tHandle in theScans:
+                self.theIndex.applyScan(tHandle, theScans[tHandle])
+
+        return len(theScans)
+
+    def makeJobs(self, theHandles):
+        """Build the list of scan jobs for scanJobs from a list of
+        handles, skipping those that cannot be indexed.
+        """
+        theJobs = []
+        for tHandle in theHandles:
+            canCount, canIndex = self.theIndex.checkItem(tHandle)
+            if not canCount:
+                continue
+            tItem = self.theProject.projTree[tHandle]
+            theJobs.append((
+                tHandle,
+                os.path.join(self.theProject.projContent, tHandle+".nwd"),
+                tItem.itemClass,
+                tItem.itemLayout,
+                canIndex,
+            ))
+        return theJobs
+
+# END Class NWIndexer
+
+# =============================================================================================== #
+#  Worker Functions
+# =============================================================================================== #
+
+def scanJobs(theJobs):
+    """Read and scan a list of documents. Documents that cannot be read
+    are skipped. A missing document is scanned as an empty document.
+    The file stamp is taken before the file is read, so a file changed
+    while being scanned will be found to be stale later.
+    """
+    theResult = []
+    for tHandle, docPath, itemClass, itemLayout, canIndex in theJobs:
+        theStamp = getFileStamp(docPath)
+        theText = _readDocument(docPath)
+        if theText is None:
+            continue
+        theScan = scanDocument(tHandle, theText, itemClass, itemLayout, canIndex)
+        theScan["stamp"] = theStamp
+        theResult.append((tHandle, theScan))
+    return theResult
+
+def _readDocument(docPath):
+    """Read a document file, skipping the meta data lines in the same
+    way as NWDoc.openDocument.
+    """
+    if not os.path.isfile(docPath):
+        return ""
+
+    theText = ""
+    try:
+        with open(docPath, mode="r", encoding="utf8") as inFile:
+            for i in range(10):
+                inLine = inFile.readline()
+                if not inLine.startswith(r"%%~"):
+                    theText = inLine
+                    break
+            theText += inFile.read()
+    except Exception as e:
+        logger.error("Failed to read document %s" % docPath)
+        logger.error(str(e))
+        return None
+
+    return theText
@@ -32,7 +32,9 @@ import os
 from datetime import datetime
 from time import time
 
-from PyQt5.QtCore import Qt, QTimer, QThreadPool
+from PyQt5.QtCore import (
+    Qt, QTimer, QThreadPool, QObject, QRunnable, pyqtSignal, pyqtSlot
+)
 from PyQt5.QtGui import QIcon, QPixmap, QColor, QKeySequence, QCursor
 from PyQt5.QtWidgets import (
     qApp, QMainWindow, QVBoxLayout, QWidget, QSplitter, QFileDialog, QShortcut,
@@ -46,7 +48,8 @@ from nw.gui import (
     GuiProjectLoad, GuiProjectSettings, GuiProjectTree, GuiProjectWizard,
     GuiTheme, GuiWritingStats
 )
-from nw.core import NWProject, NWDoc, NWIndex
+from nw.core import NWProject, NWIndex, NWIndexer
+from nw.core.indexer import scanJobs
 from nw.constants import nwItemType, nwItemClass, nwAlert, nwConst
 from nw.common import getGuiItem
 
@@ -87,6 +90,7 @@ class GuiMain(QMainWindow):
         self.theIndex    = NWIndex(self.theProject, self)
         self.hasProject  = False
         self.isFocusMode = False
+        self.indexJobId  = 0 # Background index results from other jobs are discarded
 
         # Prepare Main Window
         self.resize(*self.mainConf.getWinSize())
@@ -352,6 +356,7 @@ class GuiMain(QMainWindow):
             self.projView.closeOutline()
             self.projMeta.clearDetails()
             self.theProject.closeProject()
+            self.indexJobId += 1
             self.theIndex.clearIndex()
             self.clearGUI()
             self.hasProject = False
@@ -435,9 +440,12 @@ class GuiMain(QMainWindow):
         if self.theProject.lastViewed is not None:
             self.viewDocument(self.theProject.lastViewed)
 
-        # Check if we need to rebuild the index
+        # Check if we need to rebuild the index, or only update the
+        # documents that changed since the last session
         if self.theIndex.indexBroken:
             self.rebuildIndex()
+        else:
+            self.updateIndex()
 
         logger.debug("Project load complete")
 
@@ -760,30 +768,22 @@ class GuiMain(QMainWindow):
         tStart = time()
 
         self.treeView.saveTreeOrder()
-        self.theIndex.clearIndex()
-
-        theDoc = NWDoc(self.theProject, self)
-        for nDone, tItem in enumerate(self.theProject.projTree):
+        self.setStatus("Indexing project ...")
+        self.indexJobId += 1
 
-            if tItem is not None:
-                self.setStatus("Indexing: '%s'" % tItem.itemName)
-            else:
-                self.setStatus("Indexing: Unknown item")
+        theIndexer = NWIndexer(self.theProject, self.theIndex)
+        theIndexer.rebuildIndex(progressFunc=self._indexProgress)
 
+        # Update Word Counts
+        for tItem in self.theProject.projTree:
             if tItem is not None and tItem.itemType == nwItemType.FILE:
-                logger.verbose("Scanning: %s" % tItem.itemName)
-                theText = theDoc.openDocument(tItem.itemHandle, showStatus=False)
-
-                # Build tag index
-                self.theIndex.scanText(tItem.itemHandle, theText)
-
-                # Get Word Counts
                 cC, wC, pC = self.theIndex.getCounts(tItem.itemHandle)
                 tItem.setCharCount(cC)
                 tItem.setWordCount(wC)
                 tItem.setParaCount(pC)
                 self.treeView.propagateCount(tItem.itemHandle, wC)
-                self.treeView.projectWordCount()
+
+        self.treeView.projectWordCount()
 
         tEnd = time()
         self.setStatus("Indexing completed in %.1f ms" % ((tEnd - tStart)*1000.0))
@@ -795,6 +795,29 @@ class GuiMain(QMainWindow):
 
         return True
 
+    def updateIndex(self):
+        """Re-index the documents that have changed on disk since they
+        were last indexed. The documents are scanned in the background.
+        """
+        if not self.hasProject:
+            logger.error("No project open")
+            return False
+
+        staleHandles = self.theIndex.checkFileStamps()
+        if not staleHandles:
+            return True
+
+        logger.info("Re-indexing %d changed documents" % len(staleHandles))
+        theIndexer = NWIndexer(self.theProject, self.theIndex)
+
+        self.indexJobId += 1
+        bgIndexer = BackgroundIndexer(self.indexJobId, theIndexer.makeJobs(staleHandles))
+        bgIndexer.signals.scanReady.connect(self._applyBackgroundScan)
+        bgIndexer.signals.scanDone.connect(self._backgroundIndexDone)
+        self.threadPool.start(bgIndexer)
+
+        return True
+
     def rebuildOutline(self):
         """Force a rebuild of the Outline view.
         """
@@ -1224,6 +1247,47 @@ class GuiMain(QMainWindow):
             self.saveDocument()
         return
 
+    @pyqtSlot(int, str, object)
+    def _applyBackgroundScan(self, jobId, tHandle, theScan):
+        """Slot for the background indexer's result for one document.
+        The result is dropped if the file has changed again since it was
+        read, as it has then been indexed on save.
+        """
+        if jobId != self.indexJobId:
+            return
+        if self.theIndex.fileStamp(tHandle) != theScan["stamp"]:
+            return
+
+        self.theIndex.applyScan(tHandle, theScan)
+
+        tItem = self.theProject.projTree[tHandle]
+        if tItem is not None:
+            cC, wC, pC = self.theIndex.getCounts(tHandle)
+            tItem.setCharCount(cC)
+            tItem.setWordCount(wC)
+            tItem.setParaCount(pC)
+            self.treeView.propagateCount(tHandle, wC)
+            self.treeView.projectWordCount()
+
+        return
+
+    @pyqtSlot(int)
+    def _backgroundIndexDone(self, jobId):
+        """Slot for the background indexer's finished signal.
+        """
+        if jobId != self.indexJobId:
+            return
+        self.docEditor.updateTagHighLighting()
+        self.setStatus("Updated the index for changed documents")
+        return
+
+    def _indexProgress(self, nDone, nTotal):
+        """Triggered by the project indexer when a batch of documents
+        has been scanned.
+        """
+        self.setStatus("Indexing: %d of %d documents" % (nDone, nTotal))
+        return
+
     def _makeStatusIcons(self):
         """Generate all the item status icons based on project settings.
         """
@@ -1366,3 +1430,38 @@ class GuiMain(QMainWindow):
         return
 
 # END Class GuiMain
+
+# =============================================================================================== #
+#  The Off-GUI Thread Indexer
+#  A runnable for scanning documents in the thread pool off the main GUI thread.
+# =============================================================================================== #
+
+class BackgroundIndexer(QRunnable):
+
+    def __init__(self, jobId, theJobs):
+        QRunnable.__init__(self)
+        self.jobId = jobId
+        self.theJobs = theJobs
+        self.signals = BackgroundIndexerSignals()
+        return
+
+    @pyqtSlot()
+    def run(self):
+        """Overloaded run function for the indexer, scanning one
+        document at a time. The results are applied to the index by the
+        receiver on the main thread.
+        """
+        for theJob in self.theJobs:
+            for tHandle, theScan in scanJobs([theJob]):
+                self.signals.scanReady.emit(self.jobId, tHandle, theScan)
+        self.signals.scanDone.emit(self.jobId)
+        return
+
+# END Class BackgroundIndexer
+
+class BackgroundIndexerSignals(QObject):
+
+    scanReady = pyqtSignal(int, str, object)
+    scanDone = pyqtSignal(int)
+
+# END Class BackgroundIndexerSignals
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""novelWriter Benchmarks
+
+Timing benchmarks for the performance critical parts of novelWriter.
+These are not part of the test suite. Run them with:
+
+    python3 tests/benchmark.py [name ...]
+
+Without arguments, all benchmarks are run.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+from time import perf_counter
+from inspect import cleandoc
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, testDir)
+sys.path.insert(1, os.path.abspath(os.path.join(testDir, os.path.pardir)))
+
+import nw # noqa: E402
+
+from dummy import DummyMain # noqa: E402
+
+from nw.core.project import NWProject # noqa: E402
+from nw.core.index import NWIndex # noqa: E402
+from nw.core.indexer import NWIndexer # noqa: E402
+from nw.constants import nwItemClass # noqa: E402
+
+NOVEL_ROOT = "a508bb932959c"
+CHAR_ROOT  = "afb3043c7b2b3"
+
+theBenchmarks = {}
+
+def benchmark(theFunc):
+    """Register a benchmark function.
+    """
+    theBenchmarks[theFunc.__name__] = theFunc
+    return theFunc
+
+def timeIt(theFunc, nRuns=5):
+    """Return the best wall time of a number of calls to a function.
+    """
+    bestTime = None
+    for _ in range(nRuns):
+        tStart = perf_counter()
+        theFunc()
+        tTime = perf_counter() - tStart
+        if bestTime is None or tTime < bestTime:
+            bestTime = tTime
+    return bestTime
+
+def openMinimal(workDir):
+    """Open a copy of the minimal test project.
+    """
+    projDir = os.path.join(workDir, "minimal")
+    shutil.copytree(os.path.join(testDir, "minimal"), projDir)
+
+    theDummy = DummyMain()
+    theDummy.mainConf = nw.CONFIG
+    theProject = NWProject(theDummy)
+    theProject.projTree.setSeed(42)
+    theProject.openProject(projDir)
+
+    return theDummy, theProject
+
+##
+#  Index Benchmarks
+##
+
+@benchmark
+def indexTagScaling(workDir):
+    """Re-indexing a document should not depend on the total number of
+    tags in the project.
+    """
+    theDummy, theProject = openMinimal(workDir)
+    theIndex = NWIndex(theProject, theDummy)
+
+    nHandle = theProject.newFile("Scene", nwItemClass.NOVEL, NOVEL_ROOT)
+    cHandle = theProject.newFile("Notes", nwItemClass.CHARACTER, CHAR_ROOT)
+    docText = "# Notes\n\n@tag: Own\n\nSome text.\n"
+    sceneText = "# Scene\n\n@char: Own\n\nSome text.\n"
+
+    nTags = 0
+    print("%10s  %12s" % ("Tags", "Time [ms]"))
+    for nFiles in (10, 100, 1000):
+        while nTags < nFiles*20:
+            tHandle = theProject.newFile("Tags", nwItemClass.CHARACTER, CHAR_ROOT)
+            theIndex.scanText(tHandle, "".join(
+                "# Tag %d\n@tag: Tag%d\n\n" % (nTags + i, nTags + i) for i in range(20)
+            ))
+            nTags += 20
+
+        def doScan():
+            theIndex.scanText(cHandle, docText)
+            theIndex.scanText(nHandle, sceneText)
+
+        print("%10d  %12.3f" % (nTags, 1000*timeIt(doScan, nRuns=50)))
+
+    return
+
+@benchmark
+def indexRebuild(workDir):
+    """Full index rebuild of a 5000 document project with an increasing
+    number of worker processes.
+    """
+    theDummy, theProject = openMinimal(workDir)
+    theIndex = NWIndex(theProject, theDummy)
+
+    docText = "".join(
+        "## Scene %d\n\n@pov: Jane\n\n%% synopsis: Stuff.\n\n%s\n\n" % (
+            i, "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "*20
+        ) for i in range(10)
+    )
+    for i in range(5000):
+        tHandle = theProject.newFile("Scene %d" % i, nwItemClass.NOVEL, NOVEL_ROOT)
+        with open(os.path.join(theProject.projContent, tHandle+".nwd"), "w") as outFile:
+            outFile.write(docText)
+
+    theIndexer = NWIndexer(theProject, theIndex)
+    print("%10s  %12s" % ("Workers", "Time [s]"))
+    for numWorkers in (1, 2, 4, 8):
+        tTime = timeIt(lambda: theIndexer.rebuildIndex(numWorkers=numWorkers), nRuns=1)
+        print("%10d  %12.3f" % (numWorkers, tTime))
+    print("\nAvailable cores: %d" % (os.cpu_count() or 1))
+
+    return
+
+##
+#  Main
+##
+
+if __name__ == "__main__":
+    runList = sys.argv[1:] or list(theBenchmarks.keys())
+    for theName in runList:
+        if theName not in theBenchmarks:
+            print("Unknown benchmark: %s" % theName)
+            continue
+        print("")
+        print("Benchmark: %s" % theName)
+        print(cleandoc(theBenchmarks[theName].__doc__))
+        print("")
+        workDir = tempfile.mkdtemp()
+        try:
+            theBenchmarks[theName](workDir)
+        finally:
+            shutil.rmtree(workDir)
+    print("")
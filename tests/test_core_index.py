@@ -5,23 +5,22 @@
 import pytest
 import os
 import json
+import shutil
 
-from shutil import copyfile
-
-from tools import cmpFiles
+from copy import deepcopy
 
 from nw.core.project import NWProject
 from nw.core.index import NWIndex
 from nw.constants import nwItemClass, nwItemLayout
 
 @pytest.mark.core
-def testCoreIndex_LoadSave(monkeypatch, nwLipsum, dummyGUI, outDir, refDir):
+def testCoreIndex_LoadSave(monkeypatch, nwLipsum, dummyGUI, refDir):
     """Test core functionality of scaning, saving, loading and checking
     the index cache file.
     """
-    projFile = os.path.join(nwLipsum, "meta", "tagsIndex.json")
-    testFile = os.path.join(outDir, "coreIndex_LoadSave_tagsIndex.json")
-    compFile = os.path.join(refDir, "coreIndex_LoadSave_tagsIndex.json")
+    indexDir = os.path.join(nwLipsum, "meta", "index")
+    mainFile = os.path.join(indexDir, "manifest.json")
+    refFile = os.path.join(refDir, "coreIndex_LoadSave_tagsIndex.json")
 
     theProject = NWProject(dummyGUI)
     theProject.projTree.setSeed(42)
@@ -54,13 +53,16 @@ def testCoreIndex_LoadSave(monkeypatch, nwLipsum, dummyGUI, outDir, refDir):
     # Make the save pass
     monkeypatch.undo()
     assert theIndex.saveIndex()
+    assert os.path.isfile(mainFile)
+    assert os.path.isfile(os.path.join(indexDir, "4c4f28287af27.json"))
+    assert not os.path.isfile(os.path.join(indexDir, "b3643d0f92e32.json"))
 
     # Take a copy of the index
-    tagIndex = str(theIndex.tagIndex)
-    refIndex = str(theIndex.refIndex)
-    novelIndex = str(theIndex.novelIndex)
-    noteIndex = str(theIndex.noteIndex)
-    textCounts = str(theIndex.textCounts)
+    tagIndex = deepcopy(theIndex.tagIndex)
+    refIndex = deepcopy(theIndex.refIndex)
+    novelIndex = deepcopy(theIndex.novelIndex)
+    noteIndex = deepcopy(theIndex.noteIndex)
+    textCounts = deepcopy(theIndex.textCounts)
 
     # Delete a handle
     assert theIndex.tagIndex.get("Bod", None) is not None
@@ -89,11 +91,11 @@ def testCoreIndex_LoadSave(monkeypatch, nwLipsum, dummyGUI, outDir, refDir):
     monkeypatch.undo()
     assert theIndex.loadIndex()
 
-    assert str(theIndex.tagIndex) == tagIndex
-    assert str(theIndex.refIndex) == refIndex
-    assert str(theIndex.novelIndex) == novelIndex
-    assert str(theIndex.noteIndex) == noteIndex
-    assert str(theIndex.textCounts) == textCounts
+    assert theIndex.tagIndex == tagIndex
+    assert theIndex.refIndex == refIndex
+    assert theIndex.novelIndex == novelIndex
+    assert theIndex.noteIndex == noteIndex
+    assert theIndex.textCounts == textCounts
 
     # Break the index and check that we notice
     assert not theIndex.indexBroken
@@ -135,11 +137,199 @@ def testCoreIndex_LoadSave(monkeypatch, nwLipsum, dummyGUI, outDir, refDir):
     # Finalise
     assert theProject.closeProject()
 
-    copyfile(projFile, testFile)
-    assert cmpFiles(testFile, compFile)
+    # Reassemble the shards, which should match the reference index
+    with open(mainFile, mode="r", encoding="utf8") as inFile:
+        theMain = json.load(inFile)
+
+    theData = {
+        "tagIndex": {}, "refIndex": {}, "novelIndex": {}, "noteIndex": {}, "textCounts": {}
+    }
+    for tHandle in theMain["handles"]:
+        with open(os.path.join(indexDir, tHandle+".json"), mode="r", encoding="utf8") as inFile:
+            theShard = json.load(inFile)
+        theData["tagIndex"].update(theShard.pop("tagIndex"))
+        assert len(theShard.pop("fileStamp")) == 2
+        for theKey, theValue in theShard.items():
+            theData[theKey][tHandle] = theValue
+
+    with open(refFile, mode="r", encoding="utf8") as inFile:
+        refData = json.load(inFile)
+
+    assert theData == refData
 
 # END Test testCoreIndex_LoadSave
 
+@pytest.mark.core
+def testCoreIndex_Shards(monkeypatch, nwLipsum, dummyGUI):
+    """Test that only changed handles are written to the index folder,
+    and that the legacy index file is converted.
+    """
+    indexDir = os.path.join(nwLipsum, "meta", "index")
+    legacyFile = os.path.join(nwLipsum, "meta", "tagsIndex.json")
+
+    theProject = NWProject(dummyGUI)
+    theProject.projTree.setSeed(42)
+    assert theProject.openProject(nwLipsum)
+
+    theIndex = NWIndex(theProject, dummyGUI)
+    for tItem in theProject.projTree:
+        theIndex.reIndexHandle(tItem.itemHandle)
+    assert theIndex.saveIndex()
+
+    # Only the touched handle should be written on the next save
+    savedFiles = []
+    writeJson = theIndex._writeJson
+    def trackWrite(theFile, theData):
+        savedFiles.append(os.path.basename(theFile))
+        writeJson(theFile, theData)
+
+    monkeypatch.setattr(theIndex, "_writeJson", trackWrite)
+    assert theIndex.scanText("4c4f28287af27", "# Bod\n\n@tag: Bod\n")
+    assert theIndex.saveIndex()
+    assert savedFiles == ["4c4f28287af27.json", "manifest.json"]
+
+    # A deleted handle should have its shard removed
+    savedFiles.clear()
+    theIndex.deleteHandle("4c4f28287af27")
+    assert theIndex.saveIndex()
+    assert savedFiles == ["manifest.json"]
+    assert not os.path.isfile(os.path.join(indexDir, "4c4f28287af27.json"))
+    monkeypatch.undo()
+
+    # A missing shard should flag the index as broken
+    os.unlink(os.path.join(indexDir, "7a992350f3eb6.json"))
+    theIndex.clearIndex()
+    assert not theIndex.loadIndex()
+    assert theIndex.indexBroken
+
+    # Load the legacy format, and write the new one
+    theIndex.clearIndex()
+    for tItem in theProject.projTree:
+        theIndex.reIndexHandle(tItem.itemHandle)
+    with open(legacyFile, mode="w", encoding="utf8") as outFile:
+        json.dump({
+            "tagIndex"   : theIndex.tagIndex,
+            "refIndex"   : theIndex.refIndex,
+            "novelIndex" : theIndex.novelIndex,
+            "noteIndex"  : theIndex.noteIndex,
+            "textCounts" : theIndex.textCounts,
+        }, outFile)
+    tagIndex = deepcopy(theIndex.tagIndex)
+    shutil.rmtree(indexDir)
+
+    theIndex.clearIndex()
+    assert theIndex.loadIndex()
+    assert theIndex.tagIndex == tagIndex
+    assert theIndex.saveIndex()
+    assert not os.path.isfile(legacyFile)
+    assert os.path.isfile(os.path.join(indexDir, "7a992350f3eb6.json"))
+
+    theIndex.clearIndex()
+    assert theIndex.loadIndex()
+    assert not theIndex.indexBroken
+    assert theIndex.tagIndex == tagIndex
+
+    assert theProject.closeProject()
+
+# END Test testCoreIndex_Shards
+
+@pytest.mark.core
+def testCoreIndex_FileStamps(nwLipsum, dummyGUI):
+    """Check that documents changed outside of the index are detected.
+    """
+    theProject = NWProject(dummyGUI)
+    theProject.projTree.setSeed(42)
+    assert theProject.openProject(nwLipsum)
+
+    theIndex = NWIndex(theProject, dummyGUI)
+    for tItem in theProject.projTree:
+        theIndex.reIndexHandle(tItem.itemHandle)
+
+    # All files have stamps
+    docPath = os.path.join(nwLipsum, "content", "4c4f28287af27.nwd")
+    assert theIndex.fileStamps["4c4f28287af27"] == [
+        os.stat(docPath).st_mtime_ns, os.stat(docPath).st_size
+    ]
+    assert theIndex.checkFileStamps() == []
+
+    # The stamps are saved with the index
+    assert theIndex.saveIndex()
+    fileStamps = deepcopy(theIndex.fileStamps)
+    theIndex.clearIndex()
+    assert theIndex.loadIndex()
+    assert theIndex.fileStamps == fileStamps
+    assert theIndex.checkFileStamps() == []
+
+    # Changed and deleted files are stale
+    with open(docPath, mode="a", encoding="utf8") as outFile:
+        outFile.write("\nMore text.\n")
+    os.unlink(os.path.join(nwLipsum, "content", "7a992350f3eb6.nwd"))
+    assert theIndex.checkFileStamps() == ["7a992350f3eb6", "4c4f28287af27"]
+
+    # Items no longer in the project are removed from the index
+    theIndex.textCounts["0000000000000"] = [0, 0, 0]
+    theIndex.checkFileStamps()
+    assert "0000000000000" not in theIndex.textCounts
+
+    # Re-indexing makes them current again
+    theIndex.reIndexHandle("4c4f28287af27")
+    theIndex.scanText("7a992350f3eb6", "")
+    assert "7a992350f3eb6" not in theIndex.fileStamps
+    assert theIndex.checkFileStamps() == []
+
+    assert theProject.closeProject()
+
+# END Test testCoreIndex_FileStamps
+
+@pytest.mark.core
+def testCoreIndex_HandleTags(nwMinimal, dummyGUI):
+    """Check that the handle to tags map follows the tag index.
+    """
+    theProject = NWProject(dummyGUI)
+    theProject.projTree.setSeed(42)
+    assert theProject.openProject(nwMinimal)
+
+    theIndex = NWIndex(theProject, dummyGUI)
+    aHandle = theProject.newFile("Jane", nwItemClass.CHARACTER, "afb3043c7b2b3")
+    bHandle = theProject.newFile("John", nwItemClass.CHARACTER, "afb3043c7b2b3")
+
+    assert theIndex.scanText(aHandle, "# Jane\n@tag: Jane\n\n# Smith\n@tag: Smith\n")
+    assert theIndex.scanText(bHandle, "# John\n@tag: John\n")
+    assert theIndex.handleTags == {aHandle: {"Jane", "Smith"}, bHandle: {"John"}}
+
+    # Re-scanning a handle replaces its tags
+    assert theIndex.scanText(aHandle, "# Jane\n@tag: Jane\n")
+    assert theIndex.handleTags[aHandle] == {"Jane"}
+    assert "Smith" not in theIndex.tagIndex
+
+    # A tag redefined elsewhere moves to the new handle
+    assert theIndex.scanText(bHandle, "# John\n@tag: John\n@tag: Jane\n")
+    assert theIndex.handleTags == {aHandle: set(), bHandle: {"John", "Jane"}}
+    assert theIndex.getTagSource("Jane")[0] == bHandle
+
+    # Deleting a handle removes its tags and references
+    assert theIndex.scanText(aHandle, "# Jane\n@char: John\n")
+    assert theIndex.getTagReferences("John") == [(aHandle, "T000001")]
+    assert theIndex.getBackReferenceList(bHandle) == {aHandle: "T000001"}
+    theIndex.deleteHandle(aHandle)
+    assert theIndex.tagRefs == {}
+    assert theIndex.getBackReferenceList(bHandle) == {}
+    theIndex.deleteHandle(bHandle)
+    assert theIndex.tagIndex == {}
+    assert bHandle not in theIndex.handleTags
+
+    # The map is rebuilt on load
+    assert theIndex.scanText(bHandle, "# John\n@tag: John\n")
+    assert theIndex.saveIndex()
+    theIndex.clearIndex()
+    assert theIndex.handleTags == {}
+    assert theIndex.loadIndex()
+    assert theIndex.handleTags == {bHandle: {"John"}}
+
+    assert theProject.closeProject()
+
+# END Test testCoreIndex_HandleTags
+
 @pytest.mark.core
 def testCoreIndex_ScanThis(nwMinimal, dummyGUI):
     """Test the tag scanner function scanThis.
@@ -472,6 +662,23 @@ def testCoreIndex_ExtractData(nwMinimal, dummyGUI):
     theRefs = theIndex.getBackReferenceList(cHandle)
     assert theRefs == {nHandle: "T000001"}
 
+    ##
+    #  getTagReferences
+    ##
+
+    assert theIndex.getTagReferences("Jane") == [(nHandle, "T000001")]
+    assert theIndex.getTagReferences("Jane", "@pov") == [(nHandle, "T000001")]
+    assert theIndex.getTagReferences("Jane", "@plot") == []
+    assert theIndex.getTagReferences("John") == []
+
+    # The reference map is rebuilt on load
+    assert theIndex.saveIndex()
+    theIndex.clearIndex()
+    assert theIndex.getTagReferences("Jane") == []
+    assert theIndex.loadIndex()
+    assert theIndex.getTagReferences("Jane") == [(nHandle, "T000001")]
+    assert theIndex.getBackReferenceList(cHandle) == {nHandle: "T000001"}
+
     ##
     #  getTagSource
     ##
@@ -498,6 +705,12 @@ def testCoreIndex_ExtractData(nwMinimal, dummyGUI):
         "This is a story about Jane Smith.\n\n"
         "Well, not really.\n"
     ))
+    # Both sections refer to Jane, but the first is the back reference
+    assert theIndex.getTagReferences("Jane", "@char") == [
+        (nHandle, "T000001"), (nHandle, "T000011")
+    ]
+    assert theIndex.getBackReferenceList(cHandle) == {nHandle: "T000001"}
+
     # Whole document
     cC, wC, pC = theIndex.getCounts(nHandle)
     assert cC == 124
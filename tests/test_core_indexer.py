@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""novelWriter Project Indexer Tester
+"""
+
+import pytest
+import os
+
+from nw.core.project import NWProject
+from nw.core.index import NWIndex
+from nw.core.indexer import NWIndexer, _readDocument
+
+@pytest.mark.core
+def testCoreIndexer_Rebuild(monkeypatch, nwLipsum, dummyGUI):
+    """Test that a rebuild gives the same index as scanning each item,
+    both in-process and with a process pool.
+    """
+    theProject = NWProject(dummyGUI)
+    theProject.projTree.setSeed(42)
+    assert theProject.openProject(nwLipsum)
+
+    monkeypatch.setattr("nw.core.index.time", lambda: 123.4)
+
+    refIndex = NWIndex(theProject, dummyGUI)
+    for tItem in theProject.projTree:
+        refIndex.reIndexHandle(tItem.itemHandle)
+
+    theIndex = NWIndex(theProject, dummyGUI)
+    theIndexer = NWIndexer(theProject, theIndex)
+
+    # In-process
+    theProgress = []
+    nDocs = theIndexer.rebuildIndex(
+        progressFunc=lambda nDone, nTotal: theProgress.append((nDone, nTotal)),
+        numWorkers=1,
+    )
+    assert nDocs == 15
+    assert theProgress == [(15, 15)]
+
+    assert theIndex.tagIndex == refIndex.tagIndex
+    assert theIndex.refIndex == refIndex.refIndex
+    assert theIndex.novelIndex == refIndex.novelIndex
+    assert theIndex.noteIndex == refIndex.noteIndex
+    assert theIndex.textCounts == refIndex.textCounts
+    assert theIndex.handleTags == refIndex.handleTags
+    assert theIndex.tagRefs == refIndex.tagRefs
+
+    # Process pool, the workers do not see the patched time
+    monkeypatch.undo()
+    theProgress = []
+    monkeypatch.setattr(NWIndexer, "MIN_PARALLEL", 0)
+    nDocs = theIndexer.rebuildIndex(
+        progressFunc=lambda nDone, nTotal: theProgress.append((nDone, nTotal)),
+        numWorkers=2,
+    )
+    assert nDocs == 15
+    assert len(theProgress) == 8
+    assert theProgress[-1] == (15, 15)
+
+    assert theIndex.tagIndex == refIndex.tagIndex
+    assert theIndex.textCounts == refIndex.textCounts
+    assert theIndex.novelIndex.keys() == refIndex.novelIndex.keys()
+    for tHandle in refIndex.novelIndex:
+        assert theIndex.novelIndex[tHandle].keys() == refIndex.novelIndex[tHandle].keys()
+
+    assert theProject.closeProject()
+
+# END Test testCoreIndexer_Rebuild
+
+@pytest.mark.core
+def testCoreIndexer_ReadDocument(fncDir):
+    """Test the document reader used by the worker processes.
+    """
+    docPath = os.path.join(fncDir, "0000000000000.nwd")
+    assert _readDocument(docPath) == ""
+
+    with open(docPath, mode="w", encoding="utf8") as outFile:
+        outFile.write("%%~name: Doc\n%%~path: a/b\n# Title\n\nText\n")
+    assert _readDocument(docPath) == "# Title\n\nText\n"
+
+    os.unlink(docPath)
+    os.mkdir(docPath)
+    assert _readDocument(docPath) == ""
+
+# END Test testCoreIndexer_ReadDocument
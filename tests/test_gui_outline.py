@@ -3,6 +3,7 @@
 """
 
 import pytest
+import os
 
 from PyQt5.QtCore import Qt, QPoint
 from PyQt5.QtWidgets import QAction, QTreeWidgetItem, QMessageBox
@@ -71,3 +72,41 @@ def testGuiOutline_Main(qtbot, monkeypatch, nwGUI, nwLipsum):
     # qtbot.stopForInteraction()
 
 # END Test testGuiOutline_Main
+
+@pytest.mark.gui
+def testGuiOutline_UpdateIndex(qtbot, monkeypatch, nwGUI, nwLipsum):
+    """Test that documents changed while the project was closed are
+    re-indexed in the background when the project is opened.
+    """
+    # Block message box
+    monkeypatch.setattr(QMessageBox, "question", lambda *args: QMessageBox.Yes)
+
+    assert nwGUI.openProject(nwLipsum)
+    nwGUI.mainConf.lastPath = nwLipsum
+
+    nwGUI.rebuildIndex(beQuiet=True)
+    assert nwGUI.theIndex.novelIndex["7a992350f3eb6"]["T000001"]["title"] == "Lorem Ipsum"
+    assert nwGUI.saveProject()
+    assert nwGUI.closeProject()
+
+    # Edit the title page outside of novelWriter
+    docPath = os.path.join(nwLipsum, "content", "7a992350f3eb6.nwd")
+    with open(docPath, mode="r", encoding="utf8") as inFile:
+        docText = inFile.read()
+    with open(docPath, mode="w", encoding="utf8") as outFile:
+        outFile.write(docText.replace("# Lorem Ipsum", "# Dolor Sit"))
+
+    assert nwGUI.openProject(nwLipsum)
+    qtbot.waitUntil(
+        lambda: "T000001" in nwGUI.theIndex.novelIndex.get("7a992350f3eb6", {}) and (
+            nwGUI.theIndex.novelIndex["7a992350f3eb6"]["T000001"]["title"] == "Dolor Sit"
+        ), timeout=5000
+    )
+    assert nwGUI.theIndex.checkFileStamps() == []
+
+    nwGUI.rebuildOutline()
+    assert nwGUI.projView.topLevelItem(0).text(0) == "Dolor Sit"
+
+    # qtbot.stopForInteraction()
+
+# END Test testGuiOutline_UpdateIndex